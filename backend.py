@@ -1,10 +1,15 @@
 from fastapi import FastAPI, HTTPException, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
+import numpy as np
 import uvicorn
 from typing import Dict, Any, Optional, List, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
 from dotenv import load_dotenv
 import logging
@@ -19,10 +24,49 @@ load_dotenv()
 
 MODEL_NAME = "Hacktrix-121/deberta-v3-base-ingredients"
 
+# Default example pre-filled in the frontend (keep in sync with frontend.py)
+DEFAULT_EXAMPLE = "refined wheat flour, sugar, edible vegetable oil (palmolein), emulsifier (322), synthetic food colour (INS 133)"
+
+# Micro-batching settings for /predict
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "16"))
+MAX_BATCH_WAIT_MS = float(os.getenv("MAX_BATCH_WAIT_MS", "5"))
+
+# Number of /predict results kept in the in-memory LRU cache
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+
+# Optional INT8 ONNX model produced by export_onnx.py (served with ONNX Runtime)
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH")
+
+# Trace the PyTorch model with TorchScript (inputs are then padded to 512 tokens)
+USE_TORCHSCRIPT = os.getenv("USE_TORCHSCRIPT", "0") == "1"
+
+# Optimize the CPU model with Intel Extension for PyTorch and run it under BF16 autocast
+USE_IPEX = os.getenv("USE_IPEX", "0") == "1"
+
+# Compile the PyTorch model with torch.compile (inputs are then padded to 128-token buckets)
+USE_TORCH_COMPILE = os.getenv("USE_TORCH_COMPILE", "0") == "1"
+
+# Static shapes used when compiled: sequences are padded to 128-token buckets and
+# batches to one of a few fixed sizes, so every shape can be compiled at startup
+_COMPILE_SEQ_BUCKET = 128
+_COMPILE_SEQ_LENGTHS = tuple(range(_COMPILE_SEQ_BUCKET, 512 + 1, _COMPILE_SEQ_BUCKET))
+_COMPILE_BATCH_SIZES = tuple(sorted({size for size in (1, 4, 8, 16) if size < MAX_BATCH_SIZE} | {MAX_BATCH_SIZE}))
+
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+# Intra-op threads per process (gunicorn_conf.py splits the cores between workers)
+INFERENCE_NUM_THREADS = int(os.getenv("INFERENCE_NUM_THREADS", str(os.cpu_count() or 4)))
+
+# Avoid thread oversubscription (grad mode is per-thread, so autograd is disabled
+# on the model thread below instead of here)
+torch.set_num_threads(INFERENCE_NUM_THREADS)
+torch.set_num_interop_threads(1)
+
 app = FastAPI(
     title="Ingredient Risk Classifier API",
     description="API for classifying food ingredient risk levels",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -36,12 +80,85 @@ app.add_middleware(
 
 # Load model and tokenizer
 try:
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
-    model.eval()
-    logger.info("✅ Model loaded successfully")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=True)
+    if not tokenizer.is_fast:
+        # AutoTokenizer silently falls back to the slow Python tokenizer when the Rust one is unavailable
+        raise RuntimeError(
+            "Fast (Rust) tokenizer unavailable for this model; install `tokenizers`, "
+            "`sentencepiece` and `protobuf` so it can be built"
+        )
+    if ONNX_MODEL_PATH:
+        import onnxruntime as ort
+        sess_options = ort.SessionOptions()
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        sess_options.intra_op_num_threads = INFERENCE_NUM_THREADS
+        ort_session = ort.InferenceSession(
+            ONNX_MODEL_PATH,
+            sess_options=sess_options,
+            providers=["CPUExecutionProvider"]
+        )
+        ort_input_names = [node.name for node in ort_session.get_inputs()]
+        model = None
+        traced_model = None
+        bf16_autocast = False
+        model_compiled = False
+        logger.info("✅ ONNX model loaded successfully from %s", ONNX_MODEL_PATH)
+    else:
+        ort_session = None
+        model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, torchscript=USE_TORCHSCRIPT)
+        model.eval()
+        bf16_autocast = False
+        if USE_IPEX and DEVICE.type == "cpu":
+            try:
+                import intel_extension_for_pytorch as ipex
+                model = ipex.optimize(model, dtype=torch.bfloat16, inplace=True)
+                bf16_autocast = True
+                logger.info("✅ IPEX BF16 optimizations enabled")
+            except (Exception, SystemExit) as e:
+                # A torch/IPEX version mismatch makes the IPEX import call exit() instead of
+                # raising ImportError; fall back to FP32 rather than stopping the backend
+                logger.warning("⚠️ Intel Extension for PyTorch unavailable, using FP32: %s", e)
+        if DEVICE.type == "cuda":
+            model = model.half().to(DEVICE)
+        logger.info("✅ Model loaded successfully on %s", DEVICE)
+        
+        traced_model = None
+        if USE_TORCHSCRIPT:
+            example = tokenizer(
+                DEFAULT_EXAMPLE,
+                return_tensors="pt",
+                truncation=True,
+                max_length=512,
+                padding="max_length"
+            ).to(DEVICE)
+            with torch.no_grad(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=bf16_autocast):
+                traced_model = torch.jit.trace(
+                    model,
+                    (example["input_ids"], example["attention_mask"]),
+                    strict=False
+                )
+                traced_model = torch.jit.optimize_for_inference(traced_model)
+            logger.info("✅ TorchScript model traced successfully")
+        
+        model_compiled = False
+        if USE_TORCH_COMPILE:
+            if traced_model is not None:
+                logger.warning("⚠️ USE_TORCH_COMPILE ignored because USE_TORCHSCRIPT is enabled")
+            elif not hasattr(torch, "compile"):
+                logger.warning("⚠️ USE_TORCH_COMPILE ignored because torch %s has no torch.compile (needs 2.0+)", torch.__version__)
+            else:
+                # Keep every static shape compiled instead of falling back to eager
+                import torch._dynamo
+                num_shapes = len(_COMPILE_SEQ_LENGTHS) * len(_COMPILE_BATCH_SIZES)
+                torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, num_shapes)
+                
+                # CUDA graphs remove per-kernel launch overhead; on CPU use Inductor fusion only
+                compile_mode = "reduce-overhead" if DEVICE.type == "cuda" else "default"
+                model = torch.compile(model, mode=compile_mode, fullgraph=False, dynamic=False)
+                model_compiled = True
+                logger.info("✅ Model compiled with torch.compile (mode=%s)", compile_mode)
 except Exception as e:
-    logger.error(f"❌ Failed to load model: {e}")
+    logger.error("❌ Failed to load model: %s", e)
     raise
 
 # Global OCR instance (lazy initialization)
@@ -56,7 +173,7 @@ def get_ocr():
             _ocr_instance = easyocr.Reader(['en'], gpu=False)
             logger.info("✅ EasyOCR initialized successfully")
         except Exception as e:
-            logger.error(f"❌ Failed to initialize EasyOCR: {e}")
+            logger.error("❌ Failed to initialize EasyOCR: %s", e)
             raise HTTPException(status_code=500, detail=f"OCR initialization failed: {str(e)}")
     return _ocr_instance
 
@@ -70,6 +187,203 @@ risk_level2category = {
     5: "High Risk",
 }
 
+# (risk_level, risk_category) indexed by pred_id
+_PRED_TO_RISK = tuple(
+    (id2risk_level[i], risk_level2category[id2risk_level[i]]) for i in range(len(id2risk_level))
+)
+
+# Response keys for the probabilities of labels 0-4
+_PROB_KEYS = ("0", "1", "2", "3", "4")
+
+def _pad_batch(inputs: Dict[str, torch.Tensor], batch_size: int) -> Dict[str, torch.Tensor]:
+    """Pad tokenized inputs with masked-out rows up to batch_size."""
+    extra = batch_size - inputs["input_ids"].shape[0]
+    if extra <= 0:
+        return dict(inputs)
+    padded = {}
+    for key, value in inputs.items():
+        fill = tokenizer.pad_token_id if key == "input_ids" else 0
+        padded[key] = torch.cat([value, value.new_full((extra, value.shape[1]), fill)])
+    return padded
+
+def _torch_logits(inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+    """Run the PyTorch model (traced or compiled when enabled) and return its logits."""
+    with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=bf16_autocast):
+        if traced_model is not None:
+            return traced_model(inputs["input_ids"], inputs["attention_mask"])[0]
+        return model(**inputs).logits
+
+def classify_batch(texts: List[str]) -> List[Tuple[int, List[float]]]:
+    """Classify a batch of ingredient texts with a single padded forward pass.
+
+    Returns:
+        List of (pred_id, probabilities) tuples, one per input text.
+    """
+    if ort_session is not None:
+        inputs = tokenizer(
+            texts,
+            return_tensors="np",
+            truncation=True,
+            max_length=512,
+            # A single text never needs padding
+            padding=len(texts) > 1
+        )
+        ort_inputs = {name: inputs[name].astype(np.int64) for name in ort_input_names}
+        logits = ort_session.run(None, ort_inputs)[0]
+    else:
+        if traced_model is not None:
+            # The traced graph was recorded for 512-token inputs
+            padding, pad_to_multiple_of = "max_length", None
+        elif model_compiled:
+            # Static 128-token buckets keep the number of compiled shapes small
+            padding, pad_to_multiple_of = True, _COMPILE_SEQ_BUCKET
+        else:
+            # A single text never needs padding
+            padding, pad_to_multiple_of = len(texts) > 1, None
+        
+        inputs = tokenizer(
+            texts,
+            return_tensors="pt",
+            truncation=True,
+            max_length=512,
+            padding=padding,
+            pad_to_multiple_of=pad_to_multiple_of
+        ).to(DEVICE)
+        
+        if model_compiled:
+            # Pad the batch to the next fixed size so the compiled graph is reused
+            batch_size = next(size for size in _COMPILE_BATCH_SIZES if size >= len(texts))
+            inputs = _pad_batch(inputs, batch_size)
+        
+        logits = _torch_logits(inputs)[:len(texts)]
+        
+        # Single device-to-host transfer in FP32 (softmax stability); the rest runs in NumPy
+        logits = logits.float().cpu().numpy()
+    
+    # argmax of softmax equals argmax of logits
+    pred_ids = logits.argmax(axis=-1).tolist()
+    
+    # Softmax in NumPy
+    probs = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    probs /= probs.sum(axis=-1, keepdims=True)
+    
+    return list(zip(pred_ids, probs.tolist()))
+
+# All forward passes run on this one thread: CUDA graphs recorded by
+# torch.compile(mode="reduce-overhead") must be replayed from the thread that recorded
+# them, and it keeps /predict-image from racing the batch worker on the same model.
+# Autograd is switched off for that thread when it starts.
+_model_executor = ThreadPoolExecutor(
+    max_workers=1,
+    thread_name_prefix="model",
+    initializer=torch.set_grad_enabled,
+    initargs=(False,)
+)
+
+def _warm_up() -> Tuple[int, List[float]]:
+    """Run warm-up passes and return the prediction for the default example."""
+    if model_compiled:
+        # Compile (and on CUDA record graphs for) every shape the batcher can produce
+        for seq_len in _COMPILE_SEQ_LENGTHS:
+            inputs = tokenizer(
+                [DEFAULT_EXAMPLE],
+                return_tensors="pt",
+                truncation=True,
+                max_length=seq_len,
+                padding="max_length"
+            ).to(DEVICE)
+            for batch_size in _COMPILE_BATCH_SIZES:
+                for _ in range(3):
+                    _torch_logits(_pad_batch(inputs, batch_size))
+        logger.info("✅ Compiled %s static shapes", len(_COMPILE_SEQ_LENGTHS) * len(_COMPILE_BATCH_SIZES))
+    
+    for _ in range(3):
+        prediction = classify_batch([DEFAULT_EXAMPLE])[0]
+    return prediction
+
+# Warm up on the default example so kernel selection and JIT fusion happen before
+# the first request, and keep its prediction for the frontend's first click
+_default_prediction = _model_executor.submit(_warm_up).result()
+_precomputed_predictions: Dict[str, Tuple[int, List[float]]] = {DEFAULT_EXAMPLE: _default_prediction}
+logger.info("✅ Model warmed up")
+
+# Micro-batching queue of (text, Future) tuples, created on startup
+_batch_queue: Optional[asyncio.Queue] = None
+_batch_worker: Optional[asyncio.Task] = None
+
+async def _run_batch_worker() -> None:
+    """Collect queued /predict requests and classify them in batches."""
+    loop = asyncio.get_running_loop()
+    max_wait = MAX_BATCH_WAIT_MS / 1000
+    
+    while True:
+        batch = [await _batch_queue.get()]
+        
+        # Give concurrent requests a short window to join the batch
+        if _batch_queue.qsize() < MAX_BATCH_SIZE - 1:
+            await asyncio.sleep(max_wait)
+        while len(batch) < MAX_BATCH_SIZE and not _batch_queue.empty():
+            batch.append(_batch_queue.get_nowait())
+        
+        # Skip requests whose clients have already gone away
+        batch = [(text, future) for text, future in batch if not future.cancelled()]
+        if not batch:
+            continue
+        
+        try:
+            results = await loop.run_in_executor(_model_executor, classify_batch, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+# LRU cache of (pred_id, probabilities) keyed by normalized ingredient text
+_prediction_cache: "OrderedDict[str, Tuple[int, List[float]]]" = OrderedDict()
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so repeated ingredient labels share a cache entry."""
+    return " ".join(text.split())
+
+async def _predict_cached(text: str) -> Tuple[int, List[float]]:
+    """Return the cached prediction for text, or classify it via the batch worker."""
+    precomputed = _precomputed_predictions.get(text)
+    if precomputed is not None:
+        return precomputed
+    
+    cached = _prediction_cache.get(text)
+    if cached is not None:
+        _prediction_cache.move_to_end(text)
+        return cached
+    
+    # Queue the text for the batch worker and wait for its result
+    future = asyncio.get_running_loop().create_future()
+    await _batch_queue.put((text, future))
+    result = await future
+    
+    _prediction_cache[text] = result
+    if len(_prediction_cache) > PREDICTION_CACHE_SIZE:
+        _prediction_cache.popitem(last=False)
+    return result
+
+@app.on_event("startup")
+async def start_batch_worker() -> None:
+    """Start the micro-batching worker."""
+    global _batch_queue, _batch_worker
+    _batch_queue = asyncio.Queue()
+    _batch_worker = asyncio.create_task(_run_batch_worker())
+    logger.info("✅ Batch worker started (max_batch_size=%s, max_wait_ms=%s)", MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS)
+
+@app.on_event("shutdown")
+async def stop_batch_worker() -> None:
+    """Stop the micro-batching worker."""
+    if _batch_worker is not None:
+        _batch_worker.cancel()
+
 # Request/Response models
 class IngredientsRequest(BaseModel):
     text: str
@@ -97,7 +411,7 @@ class ImagePredictionResponse(BaseModel):
 
 # Endpoints
 @app.post("/predict", response_model=PredictionResponse)
-def predict_risk(payload: IngredientsRequest) -> PredictionResponse:
+async def predict_risk(payload: IngredientsRequest) -> PredictionResponse:
     """Predict the risk level of ingredients."""
     text = payload.text.strip()
     
@@ -105,29 +419,15 @@ def predict_risk(payload: IngredientsRequest) -> PredictionResponse:
         raise HTTPException(status_code=400, detail="Empty input text")
     
     try:
-        # Tokenize input
-        inputs = tokenizer(
-            text,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512,
-            padding=True
-        )
-        
-        # Make prediction
-        with torch.no_grad():
-            logits = model(**inputs).logits
-            probs = torch.softmax(logits, dim=-1)
+        pred_id, probs = await _predict_cached(normalize_text(text))
         
         # Process results
-        pred_id = int(torch.argmax(probs).item())
-        risk_level = id2risk_level.get(pred_id, 3)
-        risk_category = risk_level2category.get(risk_level, "Unknown")
+        risk_level, risk_category = _PRED_TO_RISK[pred_id]
         
         # Format probabilities
-        probabilities = {str(i): float(p) for i, p in enumerate(probs.tolist()[0])}
+        probabilities = dict(zip(_PROB_KEYS, probs))
         
-        logger.info(f"✅ Successfully classified ingredients with risk level {risk_level}")
+        logger.info("✅ Successfully classified ingredients with risk level %s", risk_level)
         
         return PredictionResponse(
             text=text,
@@ -139,7 +439,7 @@ def predict_risk(payload: IngredientsRequest) -> PredictionResponse:
         )
         
     except Exception as e:
-        logger.error(f"❌ Prediction failed: {str(e)}")
+        logger.error("❌ Prediction failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 @app.post("/predict-image", response_model=ImagePredictionResponse)
@@ -183,27 +483,15 @@ def predict_risk_from_image(file: UploadFile = File(...)) -> ImagePredictionResp
             raise HTTPException(status_code=400, detail="No readable text found in the image")
         
         # Classify the extracted text
-        inputs = tokenizer(
-            extracted_text,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512,
-            padding=True
-        )
-        
-        with torch.no_grad():
-            logits = model(**inputs).logits
-            probs = torch.softmax(logits, dim=-1)
+        pred_id, probs = _model_executor.submit(classify_batch, [extracted_text]).result()[0]
         
         # Process results
-        pred_id = int(torch.argmax(probs).item())
-        risk_level = id2risk_level.get(pred_id, 3)
-        risk_category = risk_level2category.get(risk_level, "Unknown")
+        risk_level, risk_category = _PRED_TO_RISK[pred_id]
         
         # Format probabilities
-        probabilities = {str(i): float(p) for i, p in enumerate(probs.tolist()[0])}
+        probabilities = dict(zip(_PROB_KEYS, probs))
         
-        logger.info(f"✅ Successfully classified OCR text with risk level {risk_level}")
+        logger.info("✅ Successfully classified OCR text with risk level %s", risk_level)
         
         return ImagePredictionResponse(
             extracted_text=extracted_text,
@@ -218,7 +506,7 @@ def predict_risk_from_image(file: UploadFile = File(...)) -> ImagePredictionResp
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Image prediction failed: {str(e)}")
+        logger.error("❌ Image prediction failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Image prediction failed: {str(e)}")
 
 @app.get("/health")
@@ -240,4 +528,4 @@ def read_root():
     }
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True, log_level="info")
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
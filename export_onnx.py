@@ -0,0 +1,69 @@
+"""Export the ingredient risk classifier to ONNX and quantize it to INT8.
+
+Usage:
+    python export_onnx.py --output-dir onnx
+
+The quantized model can then be served by setting ONNX_MODEL_PATH=onnx/model.int8.onnx
+before starting the backend.
+"""
+import argparse
+import logging
+import os
+
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Keep in sync with backend.py
+MODEL_NAME = "Hacktrix-121/deberta-v3-base-ingredients"
+
+def export_onnx(output_path: str) -> None:
+    """Export the FP32 model to ONNX with dynamic batch and sequence axes."""
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+    model.config.return_dict = False
+    model.eval()
+    
+    sample = tokenizer("refined wheat flour, sugar, emulsifier (322)", return_tensors="pt")
+    
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            output_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=14,
+        )
+    logger.info("✅ Exported ONNX model to %s", output_path)
+
+def quantize_onnx(input_path: str, output_path: str) -> None:
+    """Apply dynamic INT8 quantization to the MatMul ops of an ONNX model."""
+    quantize_dynamic(
+        input_path,
+        output_path,
+        weight_type=QuantType.QInt8,
+        op_types_to_quantize=["MatMul"],
+    )
+    logger.info("✅ Quantized ONNX model saved to %s", output_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the classifier to an INT8 ONNX model")
+    parser.add_argument("--output-dir", default="onnx", help="Directory for the exported models")
+    args = parser.parse_args()
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    fp32_path = os.path.join(args.output_dir, "model.onnx")
+    int8_path = os.path.join(args.output_dir, "model.int8.onnx")
+    
+    export_onnx(fp32_path)
+    quantize_onnx(fp32_path, int8_path)
@@ -1,14 +1,23 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
-from rag_pipeline import initialize_rag_pipeline, call_rag_pipeline, init_session_memory, add_to_chat_history, get_chat_history
+import numpy as np
+from rag_pipeline import initialize_rag_pipeline, stream_rag_pipeline, init_session_memory, add_to_chat_history, get_chat_history
 import os
+import logging
 from dotenv import load_dotenv
 
+# Set up logging (the frontend is the entry point for rag_pipeline)
+logging.basicConfig(level=logging.INFO)
+
 load_dotenv()
 API_URL = "http://localhost:8000/predict"
 IMAGE_API_URL = "http://localhost:8000/predict-image"
 
+# Chart index for model labels 0-4, shown as risk levels 1-5
+_RISK_INDEX = pd.Index(["1", "2", "3", "4", "5"], name="Risk Level")
+
 st.set_page_config(
     page_title="Ingredient Risk Classifier",
     page_icon="🍪",
@@ -62,6 +71,7 @@ tab1, tab2 = st.tabs(["📝 Text Input", "📸 Image Upload"])
 
 with tab1:
     st.subheader("Enter Ingredients")
+    # Pre-classified by the backend at startup (keep in sync with DEFAULT_EXAMPLE in backend.py)
     default_example = "refined wheat flour, sugar, edible vegetable oil (palmolein), emulsifier (322), synthetic food colour (INS 133)"
     text = st.text_area(
         "Ingredients",
@@ -113,6 +123,15 @@ def get_rag_pipeline():
         st.warning(f"⚠️ RAG pipeline initialization failed: {e}")
         return None
 
+# Shared HTTP session for backend calls (cached so connections are kept alive across reruns)
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 # Display results function
 def show_result(data: dict, show_ocr: bool = False) -> None:
     """Render the model result in the Streamlit app."""
@@ -154,20 +173,11 @@ def show_result(data: dict, show_ocr: bool = False) -> None:
                 st.subheader("Extracted Ingredients Text")
                 st.info(extracted)
         
-        # Map probabilities from labels 0-4 to risk levels 1-5
-        risk_level_mapping = {0: 1, 1: 2, 2: 3, 3: 4, 4: 5}
-        mapped_probs = {}
-        for label_str, prob_value in probs.items():
-            label_int = int(label_str)
-            risk_lvl = risk_level_mapping.get(label_int, label_int + 1)
-            mapped_probs[f"Risk Level {risk_lvl}"] = prob_value
+        # Probabilities for labels 0-4 in risk level order
+        probs_arr = np.fromiter((probs.get(str(i), 0.0) for i in range(5)), dtype=np.float32, count=5)
         
         st.subheader("Probability Distribution")
-        df_probs = pd.DataFrame(
-            [(k.replace("Risk Level ", ""), v) for k, v in mapped_probs.items()],
-            columns=["Risk Level", "Probability"]
-        )
-        st.bar_chart(df_probs.set_index("Risk Level"), height=300)
+        st.bar_chart(pd.DataFrame({"Probability": probs_arr}, index=_RISK_INDEX), height=300)
         st.caption("Model: Hacktrix-121deberta-v3-base-ingredients")
         
     except Exception as e:
@@ -181,7 +191,7 @@ if analyze_btn:
         with st.spinner("🔄 Analyzing ingredients..."):
             try:
                 # Make API request
-                response = requests.post(
+                response = get_http_session().post(
                     API_URL,
                     json={"text": text},
                     timeout=30
@@ -206,14 +216,14 @@ if analyze_btn:
                             with st.spinner("✨ Generating detailed explanation..."):
                                 rag_chain = get_rag_pipeline()
                                 if rag_chain:
-                                    rag_response = call_rag_pipeline(rag_chain, text, data)
+                                    st.subheader("Concise Ingredient Analysis")
+                                    # Stream chunks as they arrive from the LLM
+                                    rag_response = st.write_stream(stream_rag_pipeline(rag_chain, text, data))
                                     # Check if we got a valid response
-                                    if rag_response and not rag_response.startswith("Could not generate"):
-                                        st.subheader("Concise Ingredient Analysis")
-                                        st.success(rag_response)
+                                    if rag_response:
                                         st.caption("✅ Concise responses with key information for each ingredient")
                                     else:
-                                        st.warning("⚠️ Could not generate detailed explanation. " + (rag_response or "No response"))
+                                        st.warning("⚠️ Could not generate detailed explanation. No response")
                                 else:
                                     st.warning("⚠️ RAG pipeline unavailable. Showing classification only.")
                         except Exception as e:
@@ -235,7 +245,7 @@ if analyze_image_btn:
             try:
                 # Send file to API
                 files = {"file": (uploaded_file.name, uploaded_file.getbuffer(), uploaded_file.type)}
-                response = requests.post(
+                response = get_http_session().post(
                     IMAGE_API_URL,
                     files=files,
                     timeout=60
@@ -263,14 +273,14 @@ if analyze_image_btn:
                             with st.spinner("✨ Generating detailed explanation..."):
                                 rag_chain = get_rag_pipeline()
                                 if rag_chain and extracted_text:
-                                    rag_response = call_rag_pipeline(rag_chain, extracted_text, data)
+                                    st.subheader("Concise Ingredient Analysis")
+                                    # Stream chunks as they arrive from the LLM
+                                    rag_response = st.write_stream(stream_rag_pipeline(rag_chain, extracted_text, data))
                                     # Check if we got a valid response
-                                    if rag_response and not rag_response.startswith("Could not generate"):
-                                        st.subheader("Concise Ingredient Analysis")
-                                        st.success(rag_response)
+                                    if rag_response:
                                         st.caption("✅ Concise responses with key information for each ingredient")
                                     else:
-                                        st.warning("⚠️ Could not generate detailed explanation. " + (rag_response or "No response"))
+                                        st.warning("⚠️ Could not generate detailed explanation. No response")
                                 else:
                                     st.warning("⚠️ RAG pipeline unavailable. Showing classification only.")
                         except Exception as e:
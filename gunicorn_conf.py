@@ -0,0 +1,30 @@
+"""Gunicorn settings for serving the backend with multiple Uvicorn workers.
+
+Usage:
+    gunicorn backend:app -c gunicorn_conf.py -b 0.0.0.0:8000
+"""
+import os
+
+cpu_count = os.cpu_count() or 2
+
+workers = int(os.getenv("WEB_CONCURRENCY", str(max(2, cpu_count // 2))))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Each worker imports backend.py itself, so the model, CUDA context, ONNX Runtime
+# thread pool and warm-up are created after the fork. Preloading in the master would
+# leave workers with a CUDA context that cannot be re-initialized after fork and an
+# ONNX Runtime session whose threads were not copied into the child.
+preload_app = False
+
+# Workers load (and, with USE_TORCH_COMPILE, compile and warm up) the model before
+# they start heartbeating, so allow a slow boot
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "600"))
+
+def on_starting(server):
+    """Split the cores between workers so inference threads do not oversubscribe them.
+    
+    Runs in the master before forking with the final worker count (command-line
+    flags such as -w override this file), and the workers inherit the variable
+    when they import backend.py.
+    """
+    os.environ.setdefault("INFERENCE_NUM_THREADS", str(max(1, cpu_count // server.cfg.workers)))
@@ -1,13 +1,14 @@
 import os
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Iterator
 from langchain_groq import ChatGroq
+import httpx
 import streamlit as st
 from dotenv import load_dotenv
 import logging
-import re
+import json
+import threading
+import atexit
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -24,6 +25,14 @@ def create_groq_llm() -> ChatGroq:
         raise ValueError("❌ GROQ_API_KEY not found in environment variables")
     
     try:
+        # Keep-alive HTTP/2 client so Groq calls reuse their TLS connection. Built here
+        # rather than at import so a missing `h2` package is handled like any other
+        # LLM setup failure; the frontend caches the LLM, so the client is shared.
+        http_client = httpx.Client(
+            http2=True,
+            timeout=30,
+            limits=httpx.Limits(max_keepalive_connections=10),
+        )
         llm = ChatGroq(
             model="openai/gpt-oss-120b",  # Using a known working model
             temperature=0.3,  # Balanced for focused yet natural responses
@@ -31,30 +40,116 @@ def create_groq_llm() -> ChatGroq:
             groq_api_key=api_key,
             max_retries=2,
             timeout=30,
+            http_client=http_client,
         )
         logger.info("✅ Groq LLM initialized successfully")
         return llm
     except Exception as e:
-        logger.error(f"❌ Failed to create Groq LLM: {e}")
+        logger.error("❌ Failed to create Groq LLM: %s", e)
         raise
 
 # ============================================================================
 # INGREDIENT PARSING
 # ============================================================================
 
+# Map parentheses to commas so a single str.split handles all separators
+_PAREN_TBL = str.maketrans({"(": ",", ")": ","})
+
 def parse_ingredients(ingredient_text: str) -> List[str]:
     """Parse ingredient text into individual ingredients."""
     # Split by comma and parentheses
-    ingredients = re.split(r'[,()]', ingredient_text)
+    parts = ingredient_text.translate(_PAREN_TBL).split(",")
     
     # Clean up and filter
-    cleaned = []
-    for ing in ingredients:
-        ing = ing.strip()
-        if ing and len(ing) > 1 and not ing.isdigit():
-            cleaned.append(ing)
+    return [ing for ing in (part.strip() for part in parts) if len(ing) > 1 and not ing.isdigit()]
+
+# ============================================================================
+# KNOWN INGREDIENT SUMMARIES
+# ============================================================================
+
+# JSON file of normalized ingredient -> one-line summary, reused across sessions
+KNOWN_SUMMARIES_PATH = os.getenv("KNOWN_SUMMARIES_PATH", "known_ingredient_summaries.json")
+
+# Upper bound on cached summaries; the oldest entries are evicted first
+KNOWN_SUMMARIES_MAX_ENTRIES = int(os.getenv("KNOWN_SUMMARIES_MAX_ENTRIES", "5000"))
+
+# Seconds to wait after a change before writing the file, so bursts share one write
+KNOWN_SUMMARIES_SAVE_DELAY = 5.0
+
+def normalize_ingredient(ingredient: str) -> str:
+    """Normalize an ingredient name for summary lookups."""
+    return " ".join(ingredient.lower().split())
+
+def load_known_summaries(path: str) -> Dict[str, str]:
+    """Load cached ingredient summaries from disk."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            summaries = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning("⚠️ Could not load ingredient summaries from %s: %s", path, e)
+        return {}
     
-    return cleaned
+    if not isinstance(summaries, dict):
+        logger.warning("⚠️ Ignoring ingredient summaries in %s: expected a JSON object, got %s", path, type(summaries).__name__)
+        return {}
+    return summaries
+
+def save_known_summaries(summaries: Dict[str, str], path: str) -> None:
+    """Write cached ingredient summaries to disk atomically."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # Insertion order is kept so eviction order survives a reload
+            json.dump(summaries, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("⚠️ Could not save ingredient summaries to %s: %s", path, e)
+
+def parse_summary_lines(text: str, ingredients: List[str]) -> Dict[str, str]:
+    """Extract `ingredient: summary` lines for the requested ingredients from LLM output."""
+    wanted = {normalize_ingredient(ing) for ing in ingredients}
+    summaries = {}
+    for line in text.splitlines():
+        name, sep, summary = line.strip().lstrip("-*• ").partition(":")
+        key = normalize_ingredient(name.strip("*_` "))
+        summary = summary.strip()
+        if sep and summary and key in wanted:
+            summaries[key] = summary
+    return summaries
+
+_KNOWN_SUMMARIES: Dict[str, str] = load_known_summaries(KNOWN_SUMMARIES_PATH)
+_KNOWN_SUMMARIES_LOCK = threading.Lock()
+_SAVE_LOCK = threading.Lock()
+_save_timer: Optional[threading.Timer] = None
+
+def add_known_summaries(summaries: Dict[str, str]) -> None:
+    """Add summaries to the bounded cache and schedule a debounced background save."""
+    global _save_timer
+    with _KNOWN_SUMMARIES_LOCK:
+        _KNOWN_SUMMARIES.update(summaries)
+        while len(_KNOWN_SUMMARIES) > KNOWN_SUMMARIES_MAX_ENTRIES:
+            del _KNOWN_SUMMARIES[next(iter(_KNOWN_SUMMARIES))]
+        if _save_timer is None:
+            _save_timer = threading.Timer(KNOWN_SUMMARIES_SAVE_DELAY, flush_known_summaries)
+            _save_timer.daemon = True
+            _save_timer.start()
+
+def flush_known_summaries() -> None:
+    """Write pending cache changes to disk (runs on the save timer thread and at exit)."""
+    global _save_timer
+    with _KNOWN_SUMMARIES_LOCK:
+        if _save_timer is None:
+            return
+        _save_timer.cancel()
+        _save_timer = None
+        snapshot = dict(_KNOWN_SUMMARIES)
+    with _SAVE_LOCK:
+        save_known_summaries(snapshot, KNOWN_SUMMARIES_PATH)
+
+# Don't lose summaries added within the save delay before shutdown
+atexit.register(flush_known_summaries)
 
 # ============================================================================
 # CONCISE EXPLANATION GENERATOR
@@ -67,8 +162,67 @@ class IngredientExplainer:
         """Initialize the explainer."""
         self.llm = llm
     
+    def stream_explanation(self, ingredients: str, risk_level: int, risk_category: str) -> Iterator[str]:
+        """Stream an EXTREMELY concise explanation for ingredients as it is generated.
+        
+        Ingredients with a known summary are answered from the cache; only the novel
+        ones are sent to the LLM, and their summaries are cached for next time.
+        
+        Args:
+            ingredients: The ingredient list
+            risk_level: The classified risk level (1-5); not sent to the LLM, because
+                per-ingredient summaries are cached and reused across products
+            risk_category: The risk category; not sent to the LLM for the same reason
+        
+        Yields:
+            str: Chunks of the explanation text
+        
+        Raises:
+            Exception: If the LLM call fails
+        """
+        # Parse ingredients
+        ingredient_list = parse_ingredients(ingredients)
+        
+        # Split into cached and novel ingredients (deduplicated, order preserved)
+        seen = set()
+        novel = []
+        for ing in ingredient_list:
+            key = normalize_ingredient(ing)
+            if key in seen:
+                continue
+            seen.add(key)
+            summary = _KNOWN_SUMMARIES.get(key)
+            if summary is not None:
+                yield f"- {ing}: {summary}\n"
+            else:
+                novel.append(ing)
+        
+        if not novel:
+            logger.info("✅ Concise explanation served from cached summaries")
+            return
+        
+        # Simplified prompt to ensure we get a response
+        prompt = f"""Food safety expert: Briefly explain these food ingredients ({", ".join(novel)}). 
+Write exactly one line per ingredient in the form "- ingredient: purpose; concern; safer option if any". Be concise."""
+        
+        chunks = []
+        for chunk in self.llm.stream(prompt):
+            content = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if content:
+                chunks.append(content)
+                yield content
+        
+        # Cache the new per-ingredient summaries
+        new_summaries = parse_summary_lines("".join(chunks), novel)
+        if new_summaries:
+            add_known_summaries(new_summaries)
+        
+        logger.info("✅ Concise explanation streamed successfully (%s cached, %s generated)", len(seen) - len(novel), len(novel))
+    
     def generate_explanation(self, ingredients: str, risk_level: int, risk_category: str) -> str:
-        """Generate EXTREMELY concise explanation for ingredients, maximum 5 lines for each ingredient, NOTHING MORE.
+        """Generate EXTREMELY concise explanation for ingredients, one line for each ingredient, NOTHING MORE.
+        
+        Synchronous fallback for callers that need the full string; accumulates stream_explanation.
         
         Args:
             ingredients: The ingredient list
@@ -79,30 +233,14 @@ class IngredientExplainer:
             str: Ultra-concise explanation (max 1200 tokens / ~300-400 words)
         """
         try:
-            # Parse ingredients
-            ingredient_list = parse_ingredients(ingredients)
-            
-            # Create concise but comprehensive prompt
-            num_ingredients = len(ingredient_list)
-            words_per_ingredient = min(50, max(20, 400 // max(num_ingredients, 1)))
-            
-            # Simplified prompt to ensure we get a response
-            prompt = f"""Food safety expert: Briefly explain these ingredients ({", ".join(ingredient_list)}) at risk level {risk_level} ({risk_category}). 
-For each ingredient: name, purpose, concern, safer option if any. Be concise."""
-            
-            response = self.llm.invoke(prompt)
-            
-            if hasattr(response, "content"):
-                result = response.content.strip()
-            else:
-                result = str(response).strip()
+            result = "".join(self.stream_explanation(ingredients, risk_level, risk_category)).strip()
             
             logger.info("✅ Concise explanation generated successfully")
             return result
             
         except Exception as e:
             error_msg = f"Could not generate explanation: {str(e)}"
-            logger.error(f"❌ Error generating explanation: {error_msg}")
+            logger.error("❌ Error generating explanation: %s", error_msg)
             return error_msg
 
 # ============================================================================
@@ -120,7 +258,7 @@ def initialize_rag_pipeline() -> Optional[IngredientExplainer]:
         
     except Exception as e:
         error_msg = f"Failed to initialize RAG pipeline: {str(e)}"
-        logger.error(f"❌ Error initializing explainer: {error_msg}")
+        logger.error("❌ Error initializing explainer: %s", error_msg)
         return None
 
 # ============================================================================
@@ -155,9 +293,38 @@ def call_rag_pipeline(
         
     except Exception as e:
         error_msg = f"Error in RAG pipeline: {str(e)}"
-        logger.error(f"❌ Error calling explainer: {error_msg}")
+        logger.error("❌ Error calling explainer: %s", error_msg)
         return error_msg
 
+def stream_rag_pipeline(
+    explainer: IngredientExplainer,
+    user_input: str,
+    classification_result: Optional[Dict] = None
+) -> Iterator[str]:
+    """Stream the explanation for ingredients chunk by chunk.
+    
+    Args:
+        explainer: The explainer instance
+        user_input: The ingredient list
+        classification_result: Classification data
+    
+    Yields:
+        str: Chunks of the ultra-concise explanation
+    """
+    if not classification_result:
+        yield "No classification data available for explanation."
+        return
+    
+    risk_level = classification_result.get("risk_level", "unknown")
+    risk_category = classification_result.get("risk_category", "unknown")
+    
+    try:
+        yield from explainer.stream_explanation(user_input, risk_level, risk_category)
+        logger.info("✅ Explanation streamed successfully")
+    except Exception as e:
+        logger.error("❌ Error streaming explanation: %s", e)
+        raise
+
 # ============================================================================
 # SESSION MEMORY (minimal)
 # ============================================================================
@@ -176,7 +343,7 @@ def add_to_chat_history(role: str, content: str) -> None:
                 "content": content
             })
     except Exception as e:
-        logger.error(f"❌ Error: {e}")
+        logger.error("❌ Error: %s", e)
 
 def get_chat_history():
     """Get chat history."""